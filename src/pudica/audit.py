@@ -0,0 +1,106 @@
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Deque
+from cryptography.fernet import InvalidToken
+from pudica.keychain import Key
+from pudica.vault import VaultDefinition
+
+
+STATUS_OK: str = "ok"
+STATUS_MISMATCH: str = "mismatch"
+STATUS_FAILED: str = "failed"
+
+
+@dataclass
+class AuditResult:
+    vault: Optional[str]
+    id: Optional[str]
+    keyname: Optional[str]
+    decrypted_keyname: Optional[str]
+    status: str
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        return f"AuditResult({self.id}: {self.status})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def todict(self) -> Dict[str, Any]:
+        return {
+            "vault": self.vault,
+            "id": self.id,
+            "keyname": self.keyname,
+            "decrypted_keyname": self.decrypted_keyname,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class Audit:
+    @staticmethod
+    def _ordered_keys(keys: List[Key], keyname: Optional[str]) -> List[Key]:
+        return [key for key in keys if key.keyname == keyname] + [
+            key for key in keys if key.keyname != keyname
+        ]
+
+    @staticmethod
+    def check(definition: VaultDefinition, keys: List[Key]) -> AuditResult:
+        vault_path: Optional[str] = (
+            None if definition.vault is None else definition.vault.path
+        )
+        if definition.ciphertext is None:
+            return AuditResult(
+                vault_path,
+                definition.id,
+                definition.keyname,
+                None,
+                STATUS_FAILED,
+                "missing ciphertext",
+            )
+        cipherbytes: bytes = definition.ciphertext.encode("utf-8")
+        # try the recorded key first so the common case costs one decrypt
+        for key in Audit._ordered_keys(keys, definition.keyname):
+            if key.fernet is None:
+                continue
+            try:
+                key.fernet.decrypt(cipherbytes)
+            except InvalidToken:
+                continue
+            return AuditResult(
+                vault_path,
+                definition.id,
+                definition.keyname,
+                key.keyname,
+                STATUS_OK if key.keyname == definition.keyname else STATUS_MISMATCH,
+            )
+        logging.debug(f"Definition `{definition.id}` did not decrypt under any key")
+        return AuditResult(
+            vault_path,
+            definition.id,
+            definition.keyname,
+            None,
+            STATUS_FAILED,
+            "no key decrypts definition",
+        )
+
+    @staticmethod
+    def scan(
+        definitions: Iterable[VaultDefinition],
+        keys: List[Key],
+        workers: Optional[int] = None,
+        max_pending: int = 1024,
+    ) -> Iterator[AuditResult]:
+        logging.debug(f"Auditing definitions against {len(keys)} key(s)...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # bound the futures in flight so results stream in definition order
+            # without queueing the whole vault up front
+            pending: Deque[Future] = deque()
+            for definition in definitions:
+                pending.append(executor.submit(Audit.check, definition, keys))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
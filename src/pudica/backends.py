@@ -0,0 +1,338 @@
+import hashlib
+import http.client
+import logging
+import os
+import queue
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional, List, Dict, Any, Iterator, Tuple
+from urllib.parse import urlsplit
+from pudica.errors import (
+    VaultBackendError,
+    VaultWriteConflictError,
+    VaultWriteFailureError,
+)
+from pudica.fileutils import atomic_write, locked
+
+
+class VaultBackend:
+    def read(self, path: str) -> bytes:
+        raise NotImplementedError
+
+    def read_many(self, paths: List[str]) -> List[bytes]:
+        return [self.read(path) for path in paths]
+
+    def write(self, path: str, data: bytes) -> bool:
+        raise NotImplementedError
+
+    def update(self, path: str, mutate: Callable[[bytes], bytes]) -> bool:
+        raise NotImplementedError
+
+    def remove(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def stat(self, path: str) -> List[Any]:
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, path: str, shared: bool = False) -> Iterator[None]:
+        yield
+
+    def join(self, path: str, name: str) -> str:
+        return f"{path.rstrip('/')}/{name}"
+
+    def is_directory(self, path: str) -> bool:
+        return False
+
+    def makedirs(self, path: str) -> bool:
+        return True
+
+
+class LocalBackend(VaultBackend):
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def write(self, path: str, data: bytes) -> bool:
+        return atomic_write(path, data)
+
+    def update(self, path: str, mutate: Callable[[bytes], bytes]) -> bool:
+        with locked(path):
+            return atomic_write(path, mutate(self.read(path)))
+
+    def remove(self, path: str) -> bool:
+        os.unlink(path)
+        if os.path.exists(f"{path}.lock"):
+            os.unlink(f"{path}.lock")
+        return True
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def stat(self, path: str) -> List[Any]:
+        stat: os.stat_result = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @contextmanager
+    def lock(self, path: str, shared: bool = False) -> Iterator[None]:
+        with locked(path, shared):
+            yield
+
+    def join(self, path: str, name: str) -> str:
+        return os.path.join(path, name)
+
+    def is_directory(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def makedirs(self, path: str) -> bool:
+        os.makedirs(path, exist_ok=True)
+        return True
+
+
+class _ConnectionPool:
+    __slots__ = ("scheme", "netloc", "size", "timeout", "_idle", "_pid")
+
+    def __init__(self, scheme: str, netloc: str, size: int, timeout: float) -> None:
+        self.scheme: str = scheme
+        self.netloc: str = netloc
+        self.size: int = size
+        self.timeout: float = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+        self._pid: int = os.getpid()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def request(
+        self,
+        method: str,
+        target: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        if self._pid != os.getpid():
+            # connections inherited across fork share sockets with the parent
+            self._idle = queue.LifoQueue(maxsize=self.size)
+            self._pid = os.getpid()
+        for attempt in range(2):
+            reused: bool = True
+            try:
+                connection: http.client.HTTPConnection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+                reused = False
+            try:
+                connection.request(method, target, body=body, headers=headers or {})
+                response: http.client.HTTPResponse = connection.getresponse()
+                data: bytes = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                # the server may have closed an idle keep-alive connection
+                if reused and attempt == 0:
+                    logging.debug(f"Pooled connection to `{self.netloc}` failed: {e}")
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    self._idle.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            return (
+                response.status,
+                {name.lower(): value for name, value in response.getheaders()},
+                data,
+            )
+        raise VaultBackendError
+
+
+Signer = Callable[[str, str, Dict[str, str], Optional[bytes]], Dict[str, str]]
+
+
+class HTTPBackend(VaultBackend):
+    __slots__ = ("cache_dir", "headers", "signer", "pool_size", "retries", "_pool")
+
+    def __init__(
+        self,
+        base_url: str,
+        cache_dir: Optional[str] = None,
+        pool_size: int = 8,
+        timeout: float = 30.0,
+        headers: Optional[Dict[str, str]] = None,
+        retries: int = 10,
+        signer: Optional[Signer] = None,
+    ) -> None:
+        parts = urlsplit(base_url)
+        working_cache_dir: Optional[str] = cache_dir
+        if working_cache_dir is None:
+            working_cache_dir = os.environ.get(
+                "PUDICA_CACHE",
+                os.path.join(os.path.expanduser("~"), ".cache", "pudica"),
+            )
+        os.makedirs(working_cache_dir, exist_ok=True)
+        self.cache_dir: str = working_cache_dir
+        self.headers: Dict[str, str] = dict() if headers is None else headers
+        self.signer: Optional[Signer] = signer
+        self.pool_size: int = pool_size
+        self.retries: int = retries
+        self._pool: _ConnectionPool = _ConnectionPool(
+            parts.scheme, parts.netloc, pool_size, timeout
+        )
+
+    @staticmethod
+    def _target(path: str) -> str:
+        parts = urlsplit(path)
+        return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+    def _headers(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        extra: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, str]:
+        headers: Dict[str, str] = dict(self.headers)
+        if extra is not None:
+            headers.update(extra)
+        if self.signer is None:
+            return headers
+        # the signer sees the final headers, so it can sign them (e.g. SigV4)
+        return self.signer(method, path, headers, body)
+
+    def _cache_path(self, path: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(path.encode("utf-8")).hexdigest()
+        )
+
+    def _cached(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        # the etag and body share one file so they can't be updated separately
+        try:
+            with open(self._cache_path(path), "rb") as f:
+                etag: str = f.readline().rstrip(b"\n").decode("utf-8")
+                return f.read(), etag
+        except FileNotFoundError:
+            return None, None
+
+    def _store(self, path: str, data: bytes, etag: Optional[str]) -> None:
+        if etag is None:
+            if os.path.exists(self._cache_path(path)):
+                os.unlink(self._cache_path(path))
+            return
+        atomic_write(self._cache_path(path), etag.encode("utf-8") + b"\n" + data)
+
+    def _fetch(self, path: str) -> Tuple[bytes, Optional[str]]:
+        cached, etag = self._cached(path)
+        status, response_headers, body = self._pool.request(
+            "GET",
+            HTTPBackend._target(path),
+            headers=self._headers(
+                "GET", path, extra=None if cached is None else {"If-None-Match": etag}
+            ),
+        )
+        if status == 304 and cached is not None:
+            logging.debug(f"`{path}` not modified, using cached copy")
+            return cached, etag
+        if status == 404:
+            raise FileNotFoundError(path)
+        if status != 200:
+            logging.error(f"Fetching `{path}` failed with HTTP {status}")
+            raise VaultBackendError
+        etag = response_headers.get("etag", None)
+        self._store(path, body, etag)
+        return body, etag
+
+    def _put(self, path: str, data: bytes, etag: Optional[str] = None) -> bool:
+        status, response_headers, _ = self._pool.request(
+            "PUT",
+            HTTPBackend._target(path),
+            body=data,
+            headers=self._headers(
+                "PUT", path, data, None if etag is None else {"If-Match": etag}
+            ),
+        )
+        if status == 412:
+            raise VaultWriteConflictError
+        if status not in (200, 201, 204):
+            logging.error(f"Writing `{path}` failed with HTTP {status}")
+            raise VaultBackendError
+        self._store(path, data, response_headers.get("etag", None))
+        return True
+
+    def read(self, path: str) -> bytes:
+        return self._fetch(path)[0]
+
+    def read_many(self, paths: List[str]) -> List[bytes]:
+        if len(paths) < 2:
+            return [self.read(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(self.read, paths))
+
+    def write(self, path: str, data: bytes) -> bool:
+        return self._put(path, data)
+
+    def update(self, path: str, mutate: Callable[[bytes], bytes]) -> bool:
+        # optimistic concurrency: re-fetch and re-apply when another writer
+        # changed the object between our GET and our conditional PUT
+        for attempt in range(self.retries):
+            data, etag = self._fetch(path)
+            try:
+                return self._put(path, mutate(data), etag)
+            except VaultWriteConflictError:
+                logging.debug(f"`{path}` changed during update, retrying...")
+                time.sleep(random.uniform(0, min(1.0, 0.01 * 2**attempt)))
+        logging.error(f"Updating `{path}` failed after {self.retries} attempts")
+        raise VaultWriteFailureError
+
+    def remove(self, path: str) -> bool:
+        status, _, _ = self._pool.request(
+            "DELETE", HTTPBackend._target(path), headers=self._headers("DELETE", path)
+        )
+        if status not in (200, 202, 204, 404):
+            logging.error(f"Removing `{path}` failed with HTTP {status}")
+            raise VaultBackendError
+        self._store(path, bytes(), None)
+        return True
+
+    def exists(self, path: str) -> bool:
+        try:
+            self._fetch(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def stat(self, path: str) -> List[Any]:
+        data, etag = self._fetch(path)
+        return [etag if etag is not None else hashlib.sha256(data).hexdigest()]
+
+    def is_directory(self, path: str) -> bool:
+        return path.endswith("/")
+
+
+_local_backend: LocalBackend = LocalBackend()
+_backends: Dict[str, VaultBackend] = dict()
+
+
+def register_backend(prefix: str, backend: VaultBackend) -> VaultBackend:
+    _backends[prefix] = backend
+    return backend
+
+
+def backend_for(path: str) -> VaultBackend:
+    for prefix in sorted(_backends, key=len, reverse=True):
+        if path.startswith(prefix):
+            return _backends[prefix]
+    parts = urlsplit(path)
+    if parts.scheme in ("http", "https"):
+        logging.debug(f"Creating HTTP backend for `{parts.netloc}`...")
+        return register_backend(
+            f"{parts.scheme}://{parts.netloc}/", HTTPBackend(path)
+        )
+    return _local_backend
@@ -1,5 +1,13 @@
 from pudica import Pudica
+from pudica.audit import STATUS_FAILED
+from pudica.encryptor import Encryptor
+from pudica.errors import StreamMalformedError
+from pudica.index import VaultIndex
+from pudica.keychain import Keychain
+from pudica.vault import ShardedVault
+from cryptography.fernet import InvalidToken
 import click
+import json
 from typing import Optional
 
 
@@ -13,8 +21,13 @@ def cli():
 @click.option("--keychain-path", default=None)
 @click.option("--vault/--no-vault", default=False)
 @click.option("--vault-path", default=None)
+@click.option("--vault-shards", type=click.IntRange(min=1), default=None)
 def generate(
-    keychain: bool, keychain_path: Optional[str], vault: bool, vault_path: Optional[str]
+    keychain: bool,
+    keychain_path: Optional[str],
+    vault: bool,
+    vault_path: Optional[str],
+    vault_shards: Optional[int],
 ):
     if keychain:
         if keychain_path is not None:
@@ -23,7 +36,7 @@ def generate(
             Pudica.generate_keychain()
     if vault:
         if vault_path is not None:
-            Pudica.generate_vault(vault_path)
+            Pudica.generate_vault(vault_path, shard_count=vault_shards)
         else:
             Pudica.generate_vault()
 
@@ -58,5 +71,95 @@ def add_secret(keyname, id, value):
         click.echo(f"item added with id {definition.id}")
 
 
+@cli.command()
+@click.argument("input", type=click.File("rb"), default="-")
+@click.option("--output", "-o", type=click.File("wb"), default="-")
+@click.option("--keyname", "-k", default=None)
+def encrypt(input, output, keyname):
+    # streams only need the keychain, so don't require PUDICA_VAULTS
+    Encryptor.encrypt_stream(Keychain()._get_key(keyname), input, output)
+
+
+@cli.command()
+@click.argument("input", type=click.File("rb"), default="-")
+@click.option("--output", "-o", type=click.File("wb"), default="-")
+@click.option("--keyname", "-k", default=None)
+def decrypt(input, output, keyname):
+    keychain: Keychain = Keychain()
+    keys = (
+        keychain._get_multikeys() if keyname is None else [keychain._get_key(keyname)]
+    )
+    try:
+        Encryptor.decrypt_stream(keys, input, output)
+    except (InvalidToken, StreamMalformedError):
+        click.echo("decryption failed: invalid key or corrupt input", err=True)
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.option("--index-path", required=True)
+@click.option("--vault-paths", default=None)
+def build_index(index_path, vault_paths):
+    VaultIndex.build(index_path, vault_paths)
+    click.echo(f"vault index built at {index_path}")
+
+
+@cli.command()
+@click.option("--vault-path", required=True)
+@click.option("--shards", "-n", type=click.IntRange(min=1), required=True)
+def reshard(vault_path, shards):
+    ShardedVault(vault_path).reshard(shards)
+    click.echo(f"vault at {vault_path} resharded into {shards} shard(s)")
+
+
+@cli.command()
+@click.option("--keyname", "-k", default=None)
+@click.option("--workers", "-w", type=int, default=None)
+def verify(keyname, workers):
+    failed: bool = False
+    with Pudica() as pu:
+        for result in pu.audit(workers=workers):
+            if keyname is not None and keyname not in (
+                result.keyname,
+                result.decrypted_keyname,
+            ):
+                continue
+            failed = failed or result.status == STATUS_FAILED
+            click.echo(json.dumps(result.todict()))
+    if failed:
+        raise SystemExit(1)
+
+
+def _echo_tree_result(result) -> None:
+    click.echo(
+        f"{len(result.processed)} processed, {len(result.skipped)} skipped, "
+        f"{len(result.pruned)} pruned, {len(result.failed)} failed"
+    )
+    for relpath in result.failed:
+        click.echo(f"failed: {relpath}", err=True)
+    if result.failed:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument("src", type=click.Path(exists=True, file_okay=False))
+@click.argument("dst", type=click.Path(file_okay=False))
+@click.option("--keyname", "-k", default=None)
+@click.option("--workers", "-w", type=int, default=None)
+def encrypt_tree(src, dst, keyname, workers):
+    with Pudica() as pu:
+        _echo_tree_result(pu.encrypt_tree(src, dst, keyname=keyname, workers=workers))
+
+
+@cli.command()
+@click.argument("src", type=click.Path(exists=True, file_okay=False))
+@click.argument("dst", type=click.Path(file_okay=False))
+@click.option("--keyname", "-k", default=None)
+@click.option("--workers", "-w", type=int, default=None)
+def decrypt_tree(src, dst, keyname, workers):
+    with Pudica() as pu:
+        _echo_tree_result(pu.decrypt_tree(src, dst, keyname=keyname, workers=workers))
+
+
 if __name__ == "__main__":
     cli()
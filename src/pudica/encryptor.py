@@ -1,9 +1,21 @@
 from cryptography.fernet import Fernet, MultiFernet
+import logging
 import os
-from typing import Union, List
+import struct
+from typing import Union, List, BinaryIO
+from pudica.errors import StreamMalformedError
 from pudica.keychain import Key
 
 
+# Streams are a header line followed by one Fernet token per line. Each token
+# holds a frame: a sequence number and a final flag, then up to one chunk of
+# cleartext, so reordered, dropped or truncated frames are detected.
+STREAM_MAGIC: bytes = b"PUDICA-STREAM-1\n"
+STREAM_CHUNK_SIZE: int = 1 << 20
+STREAM_LINE_LIMIT: int = 64 << 20
+FRAME_HEADER = struct.Struct(">QB")
+
+
 class Encryptor:
     @staticmethod
     def _make_fernets(keys: List[Key]) -> MultiFernet:
@@ -70,3 +82,80 @@ class Encryptor:
             raise FileNotFoundError
         with open(path, "rb") as f:
             return Encryptor.decrypt_multi(keys, f.read())
+
+    @staticmethod
+    def _read_chunk(src: BinaryIO, chunk_size: int) -> bytes:
+        chunk: bytes = src.read(chunk_size)
+        # raw and non-blocking streams may return short reads before EOF
+        while chunk and len(chunk) < chunk_size:
+            more: bytes = src.read(chunk_size - len(chunk))
+            if not more:
+                break
+            chunk += more
+        return chunk
+
+    @staticmethod
+    def encrypt_stream(
+        key: Key, src: BinaryIO, dst: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> int:
+        fernet: MultiFernet = Encryptor._make_fernets([key])
+        dst.write(STREAM_MAGIC)
+        sequence: int = 0
+        chunk: bytes = Encryptor._read_chunk(src, chunk_size)
+        while True:
+            # read one chunk ahead so the last frame can be flagged as final
+            next_chunk: bytes = (
+                Encryptor._read_chunk(src, chunk_size) if chunk else bytes()
+            )
+            final: bool = len(next_chunk) == 0
+            dst.write(
+                fernet.encrypt(FRAME_HEADER.pack(sequence, final) + chunk) + b"\n"
+            )
+            sequence += 1
+            if final:
+                break
+            chunk = next_chunk
+        dst.flush()
+        logging.debug(f"Encrypted stream in {sequence} frame(s)")
+        return sequence
+
+    @staticmethod
+    def decrypt_stream(keys: List[Key], src: BinaryIO, dst: BinaryIO) -> int:
+        head: bytes = src.read(len(STREAM_MAGIC))
+        if head != STREAM_MAGIC:
+            logging.debug(f"No stream header, decrypting as a single token")
+            dst.write(Encryptor.decrypt_multi(keys, (head + src.read()).strip()))
+            dst.flush()
+            return 1
+        fernet: MultiFernet = Encryptor._make_fernets(keys)
+        sequence: int = 0
+        final: bool = False
+        while True:
+            line: bytes = src.readline(STREAM_LINE_LIMIT)
+            if not line:
+                break
+            if not line.endswith(b"\n") and len(line) >= STREAM_LINE_LIMIT:
+                logging.error(f"Stream frame {sequence} exceeds the line limit")
+                raise StreamMalformedError
+            line = line.strip()
+            if not line:
+                continue
+            if final:
+                logging.error(f"Stream has data after its final frame")
+                raise StreamMalformedError
+            frame: bytes = fernet.decrypt(line)
+            frame_sequence, frame_final = FRAME_HEADER.unpack_from(frame)
+            if frame_sequence != sequence:
+                logging.error(
+                    f"Stream frame {frame_sequence} found where {sequence} expected"
+                )
+                raise StreamMalformedError
+            dst.write(frame[FRAME_HEADER.size :])
+            sequence += 1
+            final = bool(frame_final)
+        dst.flush()
+        if not final:
+            logging.error(f"Stream truncated after {sequence} frame(s)")
+            raise StreamMalformedError
+        logging.debug(f"Decrypted stream of {sequence} frame(s)")
+        return sequence
@@ -68,3 +68,43 @@ class VaultWriteFailureError(IOError):
 
 class VaultExistsError(IOError):
     pass
+
+
+class TreeSourceNotExistsError(FileNotFoundError):
+    pass
+
+
+class TreeManifestMalformedError(ValueError):
+    pass
+
+
+class TreeDestinationOverlapError(ValueError):
+    pass
+
+
+class VaultIndexMalformedError(ValueError):
+    pass
+
+
+class VaultIndexReadOnlyError(ValueError):
+    pass
+
+
+class VaultManifestMalformedError(ValueError):
+    pass
+
+
+class VaultShardCountError(ValueError):
+    pass
+
+
+class VaultBackendError(IOError):
+    pass
+
+
+class VaultWriteConflictError(IOError):
+    pass
+
+
+class StreamMalformedError(ValueError):
+    pass
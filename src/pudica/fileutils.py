@@ -0,0 +1,57 @@
+import logging
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def atomic_write(path: str, data: bytes) -> bool:
+    logging.debug(f"Atomically writing `{path}`...")
+    directory: str = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        else:
+            # mkstemp creates 0600; give new files the mode open() would
+            umask: int = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    logging.debug(f"`{path}` written")
+    return True
+
+
+@contextmanager
+def locked(path: str, shared: bool = False) -> Iterator[None]:
+    # Lock a sidecar file: the target itself is replaced on every write, so a
+    # lock held on its inode would not be seen by the next writer.
+    if fcntl is None:
+        logging.debug(f"fcntl unavailable, not locking `{path}`")
+        yield
+        return
+    with open(f"{path}.lock", "a") as f:
+        logging.debug(
+            f"Acquiring {'shared' if shared else 'exclusive'} lock on `{path}`..."
+        )
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Optional, List, Tuple, Iterator, Any
+from pudica.errors import (
+    VaultDefinitionNotExistsError,
+    VaultIndexMalformedError,
+    VaultIndexReadOnlyError,
+)
+from pudica.backends import VaultBackend, backend_for
+from pudica.fileutils import atomic_write, locked
+from pudica.vault import ShardedVault, Vault, VaultDefinition, VaultManager
+
+
+# Layout: header, source fingerprints (json), slot table, records.
+# A slot is (hash, record offset); offset 0 marks an empty slot since records
+# always start after the table. Records are (id, keyname, ciphertext) with
+# u32 length prefixes, a keyname length of NULL_KEYNAME meaning `None`.
+MAGIC: bytes = b"PUDICAIX"
+VERSION: int = 2
+HEADER = struct.Struct("<8sIIII")
+SLOT = struct.Struct("<QQ")
+RECORD = struct.Struct("<III")
+NULL_KEYNAME: int = 0xFFFFFFFF
+# 0xff never appears in UTF-8, so it ends the id; the tag byte after it says
+# what follows, so a keyname's own bytes can't be mistaken for a marker
+NULL_KEYNAME_MARKER: bytes = b"\xff\x00"
+ANY_KEYNAME_MARKER: bytes = b"\xff\x01"
+NAMED_KEYNAME_MARKER: bytes = b"\xff\x02"
+
+
+class VaultIndex:
+    __slots__ = (
+        "path",
+        "vault_paths",
+        "keyname",
+        "check_interval",
+        "sources",
+        "_mmap",
+        "_slot_count",
+        "_table_offset",
+        "_checked",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        vault_paths: Optional[str] = None,
+        keyname: Optional[str] = None,
+        check_interval: Optional[float] = 1.0,
+    ) -> None:
+        self.path: str = path
+        self.vault_paths: List[str] = VaultManager._resolve_paths(vault_paths)
+        self.keyname: Optional[str] = keyname
+        self.check_interval: Optional[float] = check_interval
+        self._mmap: Optional[mmap.mmap] = None
+        self._rebuild_if_stale()
+        self._open()
+
+    def _open(self) -> None:
+        logging.debug(f"Mapping vault index at `{self.path}`...")
+        with open(self.path, "rb") as f:
+            mapped: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, slot_count, record_count, sources_len = HEADER.unpack_from(
+            mapped, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            logging.error(f"`{self.path}` is not a version {VERSION} vault index")
+            raise VaultIndexMalformedError
+        self.sources: List[Any] = json.loads(
+            mapped[HEADER.size : HEADER.size + sources_len].decode("utf-8")
+        )
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mapped
+        self._slot_count: int = slot_count
+        self._table_offset: int = HEADER.size + sources_len
+        self._checked: float = time.monotonic()
+        logging.debug(f"Mapped vault index with {record_count} definition(s)")
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def stale(self) -> bool:
+        return self.sources != VaultIndex._fingerprint(self.vault_paths)
+
+    def _current(self) -> bool:
+        return os.path.exists(self.path) and VaultIndex._read_sources(self.path) == (
+            VaultIndex._fingerprint(self.vault_paths)
+        )
+
+    def _rebuild_if_stale(self) -> bool:
+        if self._current():
+            return False
+        with locked(self.path):
+            # another process may have rebuilt it while we waited for the lock
+            if self._current():
+                logging.debug(f"Vault index at `{self.path}` rebuilt by another writer")
+                return False
+            VaultIndex.build(self.path, ":".join(self.vault_paths))
+        return True
+
+    def refresh(self) -> bool:
+        self._checked = time.monotonic()
+        if not self.stale():
+            return False
+        logging.debug(f"Vault index at `{self.path}` is stale, rebuilding...")
+        self._rebuild_if_stale()
+        self._open()
+        return True
+
+    def _refresh_if_due(self) -> None:
+        if (
+            self.check_interval is not None
+            and time.monotonic() - self._checked >= self.check_interval
+        ):
+            self.refresh()
+
+    def _read_record(self, offset: int) -> Tuple[VaultDefinition, int]:
+        id_len, keyname_len, ciphertext_len = RECORD.unpack_from(self._mmap, offset)
+        position: int = offset + RECORD.size
+        id: str = self._mmap[position : position + id_len].decode("utf-8")
+        position += id_len
+        keyname: Optional[str] = None
+        if keyname_len != NULL_KEYNAME:
+            keyname = self._mmap[position : position + keyname_len].decode("utf-8")
+            position += keyname_len
+        ciphertext: str = self._mmap[position : position + ciphertext_len].decode(
+            "utf-8"
+        )
+        return VaultDefinition(id, keyname, ciphertext), position + ciphertext_len
+
+    def _iter_records(self) -> Iterator[VaultDefinition]:
+        offset: int = self._table_offset + self._slot_count * SLOT.size
+        while offset < len(self._mmap):
+            definition, offset = self._read_record(offset)
+            yield definition
+
+    def _lookup(
+        self, id: str, keyname: Optional[str], any_keyname: bool
+    ) -> Optional[VaultDefinition]:
+        lookup_key: bytes = VaultIndex._lookup_key(id, keyname, any_keyname)
+        hashed: int = VaultIndex._hash(lookup_key)
+        mask: int = self._slot_count - 1
+        slot: int = hashed & mask
+        while True:
+            slot_hash, record_offset = SLOT.unpack_from(
+                self._mmap, self._table_offset + slot * SLOT.size
+            )
+            if record_offset == 0:
+                return None
+            if slot_hash == hashed:
+                definition, _ = self._read_record(record_offset)
+                if definition.id == id and (
+                    any_keyname or definition.keyname == keyname
+                ):
+                    return definition
+            slot = (slot + 1) & mask
+
+    def get(
+        self,
+        id: Optional[str] = None,
+        keyname: Optional[str] = None,
+        explicit_keyname: bool = False,
+    ) -> VaultDefinition:
+        logging.debug(
+            f"Finding indexed definition with id `{'*' if id is None else id}` and keyname `{'null' if keyname is None else keyname}`..."
+        )
+        if self.keyname is not None and keyname is None and not explicit_keyname:
+            keyname = self.keyname
+        if self.keyname is not None and keyname != self.keyname:
+            raise VaultDefinitionNotExistsError
+        self._refresh_if_due()
+        match_keyname: bool = explicit_keyname or keyname is not None
+        definition: Optional[VaultDefinition] = None
+        if id is None:
+            for candidate in self._iter_records():
+                if not match_keyname or candidate.keyname == keyname:
+                    definition = candidate
+                    break
+        else:
+            definition = self._lookup(id, keyname, not match_keyname)
+        if definition is None:
+            raise VaultDefinitionNotExistsError
+        return definition
+
+    def synthetic_vault(self) -> Vault:
+        self._refresh_if_due()
+        synthetic_vault: Vault = Vault()
+        synthetic_vault.definitions = [
+            definition
+            for definition in self._iter_records()
+            if self.keyname is None or definition.keyname == self.keyname
+        ]
+        return synthetic_vault
+
+    def upsert_definition(
+        self, definition: VaultDefinition, vault: Optional[Vault] = None
+    ) -> bool:
+        logging.error(f"Can not upsert into a read-only vault index")
+        raise VaultIndexReadOnlyError
+
+    @staticmethod
+    def _hash(b: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(b, digest_size=8).digest(), "little")
+
+    @staticmethod
+    def _lookup_key(id: str, keyname: Optional[str], any_keyname: bool) -> bytes:
+        if any_keyname:
+            return id.encode("utf-8") + ANY_KEYNAME_MARKER
+        if keyname is None:
+            return id.encode("utf-8") + NULL_KEYNAME_MARKER
+        return id.encode("utf-8") + NAMED_KEYNAME_MARKER + keyname.encode("utf-8")
+
+    @staticmethod
+    def _fingerprint(vault_paths: List[str]) -> List[Any]:
+        fingerprint: List[Any] = list()
+        for path in vault_paths:
+            backend: VaultBackend = backend_for(path)
+            files: List[str] = [path]
+            if backend.is_directory(path):
+                sharded: ShardedVault = ShardedVault(path)
+                files = [sharded._manifest_path()] + [
+                    sharded._shard_path(index) for index in range(sharded.shard_count)
+                ]
+            for file in files:
+                fingerprint.append([file] + backend.stat(file))
+        return fingerprint
+
+    @staticmethod
+    def _read_sources(path: str) -> Optional[List[Any]]:
+        with open(path, "rb") as f:
+            header: bytes = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+            magic, version, _, _, sources_len = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                return None
+            return json.loads(f.read(sources_len).decode("utf-8"))
+
+    @staticmethod
+    def build(path: str, vault_paths: Optional[str] = None) -> bool:
+        logging.debug(f"Building vault index at `{path}`...")
+        resolved_paths: List[str] = VaultManager._resolve_paths(vault_paths)
+        sources: bytes = json.dumps(VaultIndex._fingerprint(resolved_paths)).encode(
+            "utf-8"
+        )
+        vm: VaultManager = VaultManager(":".join(resolved_paths))
+        records: List[bytes] = list()
+        lookup_keys: List[List[bytes]] = list()
+        seen = set()
+        for vault in vm.vaults:
+            for definition in vault.definitions:
+                exact_key: bytes = VaultIndex._lookup_key(
+                    definition.id, definition.keyname, False
+                )
+                if exact_key in seen:
+                    continue
+                seen.add(exact_key)
+                keys: List[bytes] = [exact_key]
+                any_key: bytes = VaultIndex._lookup_key(definition.id, None, True)
+                if any_key not in seen:
+                    seen.add(any_key)
+                    keys.append(any_key)
+                id_bytes: bytes = definition.id.encode("utf-8")
+                keyname_bytes: bytes = (
+                    bytes()
+                    if definition.keyname is None
+                    else definition.keyname.encode("utf-8")
+                )
+                ciphertext_bytes: bytes = definition.ciphertext.encode("utf-8")
+                records.append(
+                    RECORD.pack(
+                        len(id_bytes),
+                        NULL_KEYNAME
+                        if definition.keyname is None
+                        else len(keyname_bytes),
+                        len(ciphertext_bytes),
+                    )
+                    + id_bytes
+                    + keyname_bytes
+                    + ciphertext_bytes
+                )
+                lookup_keys.append(keys)
+        slot_count: int = 8
+        while slot_count < 2 * len(seen):
+            slot_count *= 2
+        slots: List[Tuple[int, int]] = [(0, 0)] * slot_count
+        offset: int = HEADER.size + len(sources) + slot_count * SLOT.size
+        for record, keys in zip(records, lookup_keys):
+            for key in keys:
+                hashed: int = VaultIndex._hash(key)
+                slot: int = hashed & (slot_count - 1)
+                while slots[slot][1] != 0:
+                    slot = (slot + 1) & (slot_count - 1)
+                slots[slot] = (hashed, offset)
+            offset += len(record)
+        data: bytes = (
+            HEADER.pack(MAGIC, VERSION, slot_count, len(records), len(sources))
+            + sources
+            + b"".join(SLOT.pack(*slot) for slot in slots)
+            + b"".join(records)
+        )
+        atomic_write(path, data)
+        logging.debug(f"Vault index with {len(records)} definition(s) built at `{path}`")
+        return True
@@ -12,8 +12,10 @@ from pudica.errors import (
     KeyMalformedError,
     KeychainExistsError,
 )
+from pudica.fileutils import atomic_write, locked
 import shutil
 import base64
+import hashlib
 
 
 @dataclass
@@ -54,6 +56,11 @@ class Key:
             "updated": self.updated,
         }
 
+    def fingerprint(self) -> str:
+        return hashlib.sha256(
+            self.fernet._signing_key + self.fernet._encryption_key
+        ).hexdigest()[:16]
+
     @staticmethod
     def new(keyname: str, multikey: bool = True) -> "Key":
         keydict = {
@@ -87,37 +94,41 @@ class Keychain:
         else:
             logging.debug(f"Reading keychain from provided path: `{working_path}`...")
         self.path: str = working_path
-        with open(working_path, "r", encoding="utf-8") as f:
+        self._load()
+        return
+
+    def _load(self) -> None:
+        self.keys: List[Key] = self._read_keys()
+        logging.debug(f"Loaded {len(self.keys)} keys")
+
+    def _read_keys(self) -> List[Key]:
+        with open(self.path, "r", encoding="utf-8") as f:
             keychain: Dict[str, Any] = json.load(f)
-            self.keys: List[Key] = list()
+            keys: List[Key] = list()
             for key in keychain["keys"]:
-                self.keys.append(Key.fromdict(key))
-        logging.debug(f"Loaded {len(self.keys)} keys")
-        return
+                keys.append(Key.fromdict(key))
+        return keys
 
-    def _todict(self) -> Dict[str, Any]:
-        return {"keys": [key.todict() for key in self.keys]}
+    def _todict(self, keys: Optional[List[Key]] = None) -> Dict[str, Any]:
+        working_keys: List[Key] = self.keys if keys is None else keys
+        return {"keys": [key.todict() for key in working_keys]}
 
-    def _save(self, delete_backup: bool = True) -> bool:
+    def _save(
+        self, keep_backup: bool = False, keys: Optional[List[Key]] = None
+    ) -> bool:
         logging.debug(f"Saving keychain...")
-        logging.debug(f"Backing up keychain...")
-        backup_path: str = f"{self.path}_backup"
-        shutil.copyfile(self.path, backup_path)
-        errored: bool = False
+        if keep_backup:
+            logging.debug(f"Backing up keychain...")
+            shutil.copyfile(self.path, f"{self.path}_backup")
         try:
             logging.debug(f"Writing updated keychain...")
-            with open(self.path, "w", encoding="utf-8") as f:
-                f.write(json.dumps(self._todict(), indent="\t"))
+            atomic_write(
+                self.path,
+                json.dumps(self._todict(keys), indent="\t").encode("utf-8"),
+            )
             logging.debug(f"Updated keychain written")
         except Exception as e:
             logging.error(f"Writing updated keychain failed: {e}")
-            logging.error(f"Restoring original keychain")
-            shutil.copyfile(backup_path, self.path)
-            errored = True
-        if delete_backup:
-            os.unlink(backup_path)
-            logging.debug(f"Backup keychain deleted")
-        if errored:
             raise KeychainWriteFailureError
         logging.debug(f"Keychain update complete")
         return True
@@ -142,19 +153,25 @@ class Keychain:
 
     def add_key(self, key: Key, replace_existing: bool = True) -> bool:
         logging.debug(f"Adding key `{key.keyname}`...")
-        added: bool = False
+        with locked(self.path):
+            # merge into the keychain as it is on disk, so concurrently added
+            # keys are kept and a filtered keychain doesn't drop the others
+            keys: List[Key] = self._read_keys()
+            Keychain._merge_key(keys, key, replace_existing)
+            self._save(keys=keys)
+        Keychain._merge_key(self.keys, key, replace_existing)
+        logging.debug(f"Key `{key.keyname}` added")
+        return True
+
+    @staticmethod
+    def _merge_key(keys: List[Key], key: Key, replace_existing: bool) -> None:
         if replace_existing:
-            for i, currkey in enumerate(self.keys):
+            for i, currkey in enumerate(keys):
                 if currkey.keyname == key.keyname:
-                    self.keys[i] = key
-                    added = True
+                    keys[i] = key
                     logging.debug(f"Key `{key.keyname}` exists, overwritten")
-                    break
-        if not added:
-            self.keys.append(key)
-        logging.debug(f"Key `{key.keyname}` added")
-        self._save()
-        return True
+                    return
+        keys.append(key)
 
     def new_key(
         self,
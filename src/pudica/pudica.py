@@ -1,7 +1,10 @@
-from typing import Optional, List, Union
-from pudica.encryptor import Encryptor
+from typing import Optional, List, Union, Iterator, BinaryIO
+from pudica.audit import Audit, AuditResult
+from pudica.encryptor import Encryptor, STREAM_CHUNK_SIZE
+from pudica.index import VaultIndex
 from pudica.keychain import Key, Keychain
-from pudica.vault import VaultDefinition, VaultManager, Vault
+from pudica.tree import Tree, TreeResult
+from pudica.vault import VaultDefinition, VaultManager, Vault, ShardedVault
 import uuid
 import os
 
@@ -15,9 +18,13 @@ class Pudica:
         keyname: Optional[str] = None,
         keychain_path: Optional[str] = None,
         vault_paths: Optional[str] = None,
+        vault_index: Optional[str] = None,
     ) -> None:
         self.load_keychain(keychain_path, keyname)
-        self.load_vault(vault_paths, keyname)
+        if vault_index is not None:
+            self.load_vault_index(vault_index, vault_paths, keyname)
+        else:
+            self.load_vault(vault_paths, keyname)
 
     def __enter__(self) -> "Pudica":
         return self
@@ -44,6 +51,15 @@ class Pudica:
             self._vault: VaultManager = VaultManager(vault_paths)
         return True
 
+    def load_vault_index(
+        self,
+        index_path: str,
+        vault_paths: Optional[str] = None,
+        keyname: Optional[str] = None,
+    ) -> bool:
+        self._vault: VaultIndex = VaultIndex(index_path, vault_paths, keyname)
+        return True
+
     def encrypt(
         self,
         cleartext: Union[str, bytes],
@@ -122,6 +138,76 @@ class Pudica:
                 f.write(encrypted)
         return encrypted
 
+    def encrypt_stream(
+        self,
+        src: BinaryIO,
+        dst: BinaryIO,
+        *,
+        keyname: Optional[str] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> int:
+        key: Key = self._keychain._get_key(keyname)
+        return Encryptor.encrypt_stream(key, src, dst, chunk_size)
+
+    def decrypt_stream(
+        self,
+        src: BinaryIO,
+        dst: BinaryIO,
+        *,
+        keyname: Optional[str] = None,
+    ) -> int:
+        keys: List[Key] = (
+            self._keychain._get_multikeys()
+            if keyname is None
+            else [self._keychain._get_key(keyname)]
+        )
+        return Encryptor.decrypt_stream(keys, src, dst)
+
+    def encrypt_tree(
+        self,
+        src: str,
+        dst: str,
+        *,
+        keyname: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> TreeResult:
+        key: Key = self._keychain._get_key(keyname)
+        return Tree.process(
+            src,
+            dst,
+            lambda b: Encryptor.encrypt_bytes(key, b),
+            key.keyname,
+            key.fingerprint(),
+            workers,
+        )
+
+    def decrypt_tree(
+        self,
+        src: str,
+        dst: str,
+        *,
+        keyname: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> TreeResult:
+        keys: List[Key] = (
+            self._keychain._get_multikeys()
+            if keyname is None
+            else [self._keychain._get_key(keyname)]
+        )
+        return Tree.process(
+            src,
+            dst,
+            lambda b: Encryptor.decrypt_multi(keys, b),
+            keyname,
+            ",".join(key.fingerprint() for key in keys),
+            workers,
+        )
+
+    def audit(self, *, workers: Optional[int] = None) -> Iterator[AuditResult]:
+        return Audit.scan(
+            self._vault.synthetic_vault().definitions, self._keychain.keys, workers
+        )
+
     @staticmethod
     def generate_keychain(
         path: str = f"{os.path.expanduser('~')}{os.path.sep}.pudica_keychain",
@@ -131,6 +217,11 @@ class Pudica:
         return Pudica(keychain_path=path)
 
     @staticmethod
-    def generate_vault(path: str, overwrite: bool = False) -> "Pudica":
-        Vault.generate(path, overwrite)
+    def generate_vault(
+        path: str, overwrite: bool = False, shard_count: Optional[int] = None
+    ) -> "Pudica":
+        if shard_count is not None:
+            ShardedVault.generate(path, shard_count, overwrite)
+        else:
+            Vault.generate(path, overwrite)
         return Pudica(vault_paths=path)
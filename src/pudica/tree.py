@@ -0,0 +1,234 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Optional, List, Dict, Any, Tuple
+from pudica.errors import (
+    TreeSourceNotExistsError,
+    TreeManifestMalformedError,
+    TreeDestinationOverlapError,
+)
+from pudica.fileutils import atomic_write
+
+
+MANIFEST_NAME: str = ".pudica_manifest"
+
+
+@dataclass
+class TreeEntry:
+    sha256: str
+    size: int
+    mtime_ns: int
+    keyname: Optional[str]
+    key_fingerprint: Optional[str] = None
+
+    @staticmethod
+    def fromdict(d: Dict[str, Any]) -> "TreeEntry":
+        if "sha256" not in d or "size" not in d or "mtime_ns" not in d:
+            logging.error(f"Tree manifest entry missing sha256, size or mtime_ns")
+            raise TreeManifestMalformedError
+        return TreeEntry(
+            sha256=d["sha256"],
+            size=d["size"],
+            mtime_ns=d["mtime_ns"],
+            keyname=d.get("keyname", None),
+            key_fingerprint=d.get("key_fingerprint", None),
+        )
+
+    def todict(self) -> Dict[str, Any]:
+        return {
+            "sha256": self.sha256,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "keyname": self.keyname,
+            "key_fingerprint": self.key_fingerprint,
+        }
+
+
+@dataclass
+class TreeResult:
+    processed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    pruned: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return (
+            f"TreeResult({len(self.processed)} processed, {len(self.skipped)} skipped, "
+            f"{len(self.pruned)} pruned, {len(self.failed)} failed)"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class TreeManifest:
+    __slots__ = ("path", "entries")
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.entries: Dict[str, TreeEntry] = dict()
+        if not os.path.exists(path):
+            logging.debug(f"No tree manifest at `{path}`, starting empty")
+            return
+        logging.debug(f"Reading tree manifest at `{path}`...")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest: Dict[str, Any] = json.load(f)
+            if not isinstance(manifest.get("files", dict()), dict):
+                raise TreeManifestMalformedError
+            for relpath, entry in manifest.get("files", dict()).items():
+                self.entries[relpath] = TreeEntry.fromdict(entry)
+        except (ValueError, AttributeError) as e:
+            # an unreadable manifest only costs a full re-run, so start over
+            logging.error(f"Tree manifest at `{path}` is malformed, ignoring it: {e}")
+            self.entries = dict()
+            return
+        logging.debug(f"Loaded {len(self.entries)} tree manifest entries")
+
+    def _todict(self) -> Dict[str, Any]:
+        return {
+            "files": {
+                relpath: self.entries[relpath].todict()
+                for relpath in sorted(self.entries)
+            }
+        }
+
+    def _save(self) -> bool:
+        logging.debug(f"Saving tree manifest at `{self.path}`...")
+        return atomic_write(
+            self.path, json.dumps(self._todict(), indent="\t").encode("utf-8")
+        )
+
+
+class Tree:
+    @staticmethod
+    def _walk(src: str, dst: str) -> List[str]:
+        relpaths: List[str] = list()
+        dst_abspath: str = os.path.abspath(dst)
+        for dirpath, dirnames, filenames in os.walk(src):
+            dirnames[:] = [
+                dirname
+                for dirname in sorted(dirnames)
+                if os.path.abspath(os.path.join(dirpath, dirname)) != dst_abspath
+            ]
+            for filename in sorted(filenames):
+                relpath: str = os.path.relpath(os.path.join(dirpath, filename), src)
+                if relpath == MANIFEST_NAME:
+                    continue
+                relpaths.append(relpath)
+        return relpaths
+
+    @staticmethod
+    def _process_file(
+        src: str,
+        dst: str,
+        relpath: str,
+        entry: Optional[TreeEntry],
+        transform: Callable[[bytes], bytes],
+        keyname: Optional[str],
+        key_fingerprint: Optional[str],
+    ) -> Tuple[bool, TreeEntry]:
+        src_path: str = os.path.join(src, relpath)
+        dst_path: str = os.path.join(dst, relpath)
+        stat: os.stat_result = os.stat(src_path)
+        reusable: bool = (
+            entry is not None
+            and entry.keyname == keyname
+            and entry.key_fingerprint == key_fingerprint
+            and os.path.exists(dst_path)
+        )
+        if (
+            reusable
+            and entry.size == stat.st_size
+            and entry.mtime_ns == stat.st_mtime_ns
+        ):
+            return False, entry
+        with open(src_path, "rb") as f:
+            data: bytes = f.read()
+        sha256: str = hashlib.sha256(data).hexdigest()
+        new_entry: TreeEntry = TreeEntry(
+            sha256, stat.st_size, stat.st_mtime_ns, keyname, key_fingerprint
+        )
+        if reusable and entry.sha256 == sha256:
+            logging.debug(f"`{relpath}` touched but unchanged")
+            return False, new_entry
+        os.makedirs(os.path.dirname(dst_path) or dst, exist_ok=True)
+        atomic_write(dst_path, transform(data))
+        return True, new_entry
+
+    @staticmethod
+    def _prune(dst: str, relpath: str) -> None:
+        dst_path: str = os.path.join(dst, relpath)
+        if os.path.exists(dst_path):
+            os.unlink(dst_path)
+        directory: str = os.path.dirname(dst_path)
+        while os.path.abspath(directory) != os.path.abspath(dst):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    @staticmethod
+    def process(
+        src: str,
+        dst: str,
+        transform: Callable[[bytes], bytes],
+        keyname: Optional[str] = None,
+        key_fingerprint: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> TreeResult:
+        logging.debug(f"Processing tree `{src}` into `{dst}`...")
+        if not os.path.isdir(src):
+            logging.error(f"Tree source `{src}` is not a directory")
+            raise TreeSourceNotExistsError
+        src_realpath: str = os.path.realpath(src)
+        dst_realpath: str = os.path.realpath(dst)
+        # writing into the source (or above it) would feed outputs back in
+        if os.path.commonpath([src_realpath, dst_realpath]) == dst_realpath:
+            logging.error(f"Tree destination `{dst}` contains source `{src}`")
+            raise TreeDestinationOverlapError
+        os.makedirs(dst, exist_ok=True)
+        manifest: TreeManifest = TreeManifest(os.path.join(dst, MANIFEST_NAME))
+        result: TreeResult = TreeResult()
+        relpaths: List[str] = Tree._walk(src, dst)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    Tree._process_file,
+                    src,
+                    dst,
+                    relpath,
+                    manifest.entries.get(relpath, None),
+                    transform,
+                    keyname,
+                    key_fingerprint,
+                ): relpath
+                for relpath in relpaths
+            }
+            for future in as_completed(futures):
+                relpath: str = futures[future]
+                try:
+                    processed, entry = future.result()
+                except Exception as e:
+                    logging.error(f"Processing `{relpath}` failed: {e}")
+                    result.failed.append(relpath)
+                    continue
+                manifest.entries[relpath] = entry
+                if processed:
+                    result.processed.append(relpath)
+                else:
+                    result.skipped.append(relpath)
+        present = set(relpaths)
+        for relpath in sorted(manifest.entries):
+            if relpath not in present:
+                logging.debug(f"`{relpath}` removed from source, pruning")
+                Tree._prune(dst, relpath)
+                del manifest.entries[relpath]
+                result.pruned.append(relpath)
+        manifest._save()
+        logging.debug(f"Tree processed: {result}")
+        return result
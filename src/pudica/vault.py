@@ -1,5 +1,5 @@
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 import os
 from pudica.errors import (
     VaultEnvVarNotSetError,
@@ -9,10 +9,20 @@ from pudica.errors import (
     VaultUpsertSyntheticError,
     VaultWriteFailureError,
     VaultExistsError,
+    VaultManifestMalformedError,
+    VaultShardCountError,
 )
+from pudica.backends import VaultBackend, backend_for
 import json
 from dataclasses import dataclass
-import shutil
+import hashlib
+import random
+import re
+import time
+
+
+SHARD_MANIFEST_NAME: str = "manifest.json"
+SHARD_UPSERT_RETRIES: int = 50
 
 
 @dataclass
@@ -20,7 +30,7 @@ class VaultDefinition:
     id: Optional[str] = None
     keyname: Optional[str] = None
     ciphertext: Optional[str] = None
-    vault: Optional["Vault"] = None
+    vault: Optional[Union["Vault", "ShardedVault"]] = None
 
     def __str__(self) -> str:
         return f"VaultDefinition({self.id}: encrypted using {self.keyname})"
@@ -49,24 +59,34 @@ class VaultDefinition:
 
 
 class Vault:
-    __slots__ = ("path", "definitions", "is_synthetic")
+    __slots__ = ("path", "definitions", "is_synthetic", "backend")
 
-    def __init__(self, path: Optional[str] = None) -> None:
+    def __init__(
+        self, path: Optional[str] = None, data: Optional[bytes] = None
+    ) -> None:
         self.is_synthetic: bool = False
         self.path: Optional[str] = None
+        self.backend: Optional[VaultBackend] = None
+        self.definitions: List[VaultDefinition] = list()
         if path is None:
             logging.debug(f"No path provided, creating a synthetic vault")
             self.is_synthetic = True
             return
         self.path: str = path
+        self.backend: VaultBackend = backend_for(path)
+        self._load(data)
+
+    def _load(self, data: Optional[bytes] = None) -> None:
         logging.debug(f"Reading vault at `{self.path}`...")
-        self.definitions: List[VaultDefinition] = list()
-        with open(path, "r", encoding="utf-8") as f:
-            vault_data: Dict[str, Any] = json.loads(f.read())
-            for definition in vault_data.get("definitions", list()):
-                vaultdefinition = VaultDefinition.fromdict(definition)
-                vaultdefinition.vault = self
-                self.definitions.append(vaultdefinition)
+        if data is None:
+            data = self.backend.read(self.path)
+        vault_data: Dict[str, Any] = json.loads(data.decode("utf-8"))
+        definitions: List[VaultDefinition] = list()
+        for definition in vault_data.get("definitions", list()):
+            vaultdefinition = VaultDefinition.fromdict(definition)
+            vaultdefinition.vault = self
+            definitions.append(vaultdefinition)
+        self.definitions = definitions
         logging.debug(
             f"Loaded {len(self.definitions)} definition(s) from vault at `{self.path}`"
         )
@@ -74,6 +94,12 @@ class Vault:
     def get_ids(self, id: str) -> List[VaultDefinition]:
         return [definition for definition in self.definitions if definition.id == id]
 
+    def get_many_ids(self, ids: List[str]) -> List[VaultDefinition]:
+        wanted = set(ids)
+        return [
+            definition for definition in self.definitions if definition.id in wanted
+        ]
+
     def get_keynames(self, keyname: str) -> List[VaultDefinition]:
         return [
             definition
@@ -115,60 +141,340 @@ class Vault:
         if self.is_synthetic is True:
             logging.error(f"Can not upsert on a sythetic vault")
             raise VaultUpsertSyntheticError
-        for pos, defn in enumerate(self.definitions):
-            if defn.id == definition.id and defn.keyname == definition.keyname:
-                self.definitions[pos] = definition
-                definition.vault = self
-                return self._save()
-        definition.vault = self
-        self.definitions.append(definition)
-        return self._save()
 
-    def _todict(self) -> Dict[str, Any]:
-        return {"definitions": [defn.todict() for defn in self.definitions]}
+        def merge(data: bytes) -> bytes:
+            # applied by the backend to the vault's current contents, so
+            # concurrent writers' upserts are kept
+            self._load(data)
+            definition.vault = self
+            for pos, defn in enumerate(self.definitions):
+                if defn.id == definition.id and defn.keyname == definition.keyname:
+                    self.definitions[pos] = definition
+                    break
+            else:
+                self.definitions.append(definition)
+            return json.dumps(self._todict(), indent="\t").encode("utf-8")
 
-    def _save(self, delete_backup: bool = True) -> bool:
-        logging.debug(f"Saving vault at path `{self.path}`...")
-        logging.debug(f"Backing up vault...")
-        backup_path: str = f"{self.path}_backup"
-        shutil.copyfile(self.path, backup_path)
-        errored: bool = False
+        logging.debug(f"Upserting definition `{definition.id}` into `{self.path}`...")
         try:
-            logging.debug(f"Writing updated vault...")
-            with open(self.path, "w", encoding="utf-8") as f:
-                f.write(json.dumps(self._todict(), indent="\t"))
-            logging.debug(f"Updated vault written")
+            self.backend.update(self.path, merge)
+        except VaultWriteFailureError:
+            raise
         except Exception as e:
             logging.error(f"Writing updated vault failed: {e}")
-            logging.error(f"Restoring original vault")
-            shutil.copyfile(backup_path, self.path)
-            errored = True
-        if delete_backup:
-            os.unlink(backup_path)
-            logging.debug(f"Backup vault deleted")
-        if errored:
             raise VaultWriteFailureError
         logging.debug(f"Vault update complete")
         return True
 
+    def _todict(self) -> Dict[str, Any]:
+        return {"definitions": [defn.todict() for defn in self.definitions]}
+
     @staticmethod
     def generate(path: str, overwrite: bool = False) -> "Vault":
         logging.debug(f"Generating new vault at path `{path}`...")
-        if os.path.exists(path) and overwrite is False:
+        backend: VaultBackend = backend_for(path)
+        if backend.exists(path) and overwrite is False:
             logging.error(f"Vault already exists at `{path}`")
             raise VaultExistsError
         newvault = {"definitions": list()}
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(json.dumps(newvault, indent="\t"))
+        backend.write(path, json.dumps(newvault, indent="\t").encode("utf-8"))
         logging.debug(f"New vault generated at `{path}`")
         return Vault(path)
 
 
+class ShardedVault:
+    __slots__ = (
+        "path",
+        "shard_count",
+        "generation",
+        "shards",
+        "resharding",
+        "is_synthetic",
+        "backend",
+    )
+
+    def __init__(self, path: str) -> None:
+        self.is_synthetic: bool = False
+        self.path: str = path
+        self.backend: VaultBackend = backend_for(path)
+        self.generation: int = -1
+        self.resharding: bool = False
+        self.shards: Dict[int, Vault] = dict()
+        logging.debug(f"Reading sharded vault at `{self.path}`...")
+        self._read_manifest()
+
+    def _manifest_path(self) -> str:
+        return self.backend.join(self.path, SHARD_MANIFEST_NAME)
+
+    def _read_manifest(self) -> None:
+        manifest: Dict[str, Any] = json.loads(
+            self.backend.read(self._manifest_path()).decode("utf-8")
+        )
+        if "shards" not in manifest or "generation" not in manifest:
+            logging.error(f"Sharded vault manifest missing shards or generation")
+            raise VaultManifestMalformedError
+        if not isinstance(manifest["shards"], int) or manifest["shards"] < 1:
+            logging.error(f"Sharded vault manifest has an invalid shard count")
+            raise VaultManifestMalformedError
+        if manifest["generation"] != self.generation:
+            self.shards = dict()
+        self.shard_count: int = manifest["shards"]
+        self.generation = manifest["generation"]
+        self.resharding = manifest.get("resharding", False)
+        logging.debug(
+            f"Sharded vault at `{self.path}` has {self.shard_count} shard(s) in generation {self.generation}"
+        )
+
+    def _shard_path(self, index: int, generation: Optional[int] = None) -> str:
+        return ShardedVault._shard_path_for(
+            self.path, self.generation if generation is None else generation, index
+        )
+
+    def _shard(self, index: int, data: Optional[bytes] = None) -> Vault:
+        if index not in self.shards:
+            shard: Vault = Vault(self._shard_path(index), data)
+            for definition in shard.definitions:
+                definition.vault = self
+            self.shards[index] = shard
+        return self.shards[index]
+
+    def _shard_for(self, id: str) -> Vault:
+        try:
+            return self._shard(ShardedVault.shard_index(id, self.shard_count))
+        except FileNotFoundError:
+            logging.debug(f"Vault at `{self.path}` resharded, re-reading manifest...")
+            self._read_manifest()
+            return self._shard(ShardedVault.shard_index(id, self.shard_count))
+
+    @property
+    def definitions(self) -> List[VaultDefinition]:
+        try:
+            return [
+                definition
+                for index in range(self.shard_count)
+                for definition in self._shard(index).definitions
+            ]
+        except FileNotFoundError:
+            logging.debug(f"Vault at `{self.path}` resharded, re-reading manifest...")
+            self._read_manifest()
+            return [
+                definition
+                for index in range(self.shard_count)
+                for definition in self._shard(index).definitions
+            ]
+
+    def get_ids(self, id: str) -> List[VaultDefinition]:
+        return self._shard_for(id).get_ids(id)
+
+    def _fetch_shards(self, indexes: List[int]) -> None:
+        missing: List[int] = [index for index in indexes if index not in self.shards]
+        datas: List[bytes] = self.backend.read_many(
+            [self._shard_path(index) for index in missing]
+        )
+        for index, data in zip(missing, datas):
+            self._shard(index, data)
+
+    def get_many_ids(self, ids: List[str]) -> List[VaultDefinition]:
+        # fetch every shard the ids route to in one batch, once per shard
+        try:
+            indexes: List[int] = sorted(
+                {ShardedVault.shard_index(id, self.shard_count) for id in ids}
+            )
+            self._fetch_shards(indexes)
+        except FileNotFoundError:
+            logging.debug(f"Vault at `{self.path}` resharded, re-reading manifest...")
+            self._read_manifest()
+            indexes = sorted(
+                {ShardedVault.shard_index(id, self.shard_count) for id in ids}
+            )
+            self._fetch_shards(indexes)
+        definitions: List[VaultDefinition] = list()
+        for index in indexes:
+            definitions += self.shards[index].get_many_ids(ids)
+        return definitions
+
+    def get_keynames(self, keyname: str) -> List[VaultDefinition]:
+        return [
+            definition
+            for definition in self.definitions
+            if definition.keyname == keyname
+        ]
+
+    def synthetic(self) -> Vault:
+        vault: Vault = Vault()
+        vault.add_definitions(self.definitions)
+        return vault
+
+    def upsert(self, definition: VaultDefinition) -> bool:
+        # A shared manifest lock keeps reshard from moving shards mid-write.
+        # Remote backends can't lock, so the manifest is re-read after the
+        # write too: if a reshard started or finished meanwhile, the write may
+        # have missed its snapshot and is redone against the new generation.
+        for attempt in range(SHARD_UPSERT_RETRIES):
+            with self.backend.lock(self._manifest_path(), shared=True):
+                self._read_manifest()
+                if not self.resharding:
+                    generation: int = self.generation
+                    try:
+                        shard: Vault = self._shard_for(definition.id)
+                        logging.debug(
+                            f"Upserting definition `{definition.id}` into `{shard.path}`"
+                        )
+                        shard.upsert(definition)
+                    except (FileNotFoundError, VaultWriteFailureError):
+                        # only a reshard is worth retrying; real write errors
+                        # leave the manifest as it was
+                        self._read_manifest()
+                        if not self.resharding and self.generation == generation:
+                            raise
+                        logging.debug(f"Shard for `{definition.id}` moved by a reshard")
+                    else:
+                        self._read_manifest()
+                        if not self.resharding and self.generation == generation:
+                            for defn in shard.definitions:
+                                defn.vault = self
+                            return True
+            logging.debug(f"Vault at `{self.path}` is being resharded, retrying...")
+            time.sleep(random.uniform(0, min(1.0, 0.01 * 2**attempt)))
+        logging.error(
+            f"Upserting into `{self.path}` failed after {SHARD_UPSERT_RETRIES} attempts"
+        )
+        raise VaultWriteFailureError
+
+    def _save_manifest(self) -> bool:
+        return self.backend.write(
+            self._manifest_path(),
+            json.dumps(
+                {
+                    "shards": self.shard_count,
+                    "generation": self.generation,
+                    "resharding": self.resharding,
+                },
+                indent="\t",
+            ).encode("utf-8"),
+        )
+
+    def reshard(self, shard_count: int) -> bool:
+        logging.debug(
+            f"Resharding vault at `{self.path}` into {shard_count} shard(s)..."
+        )
+        ShardedVault._check_shard_count(shard_count)
+        with self.backend.lock(self._manifest_path()):
+            self._read_manifest()
+            # announce the reshard before taking the snapshot, so writers that
+            # can't see the lock notice it and redo their upserts afterwards
+            self.resharding = True
+            self._save_manifest()
+            generation: int = self.generation + 1
+            written: List[str] = list()
+            try:
+                self.shards = dict()
+                definitions: List[VaultDefinition] = self.definitions
+                old_paths: List[str] = [
+                    self._shard_path(index) for index in range(self.shard_count)
+                ]
+                buckets: List[List[VaultDefinition]] = [
+                    list() for _ in range(shard_count)
+                ]
+                for definition in definitions:
+                    buckets[
+                        ShardedVault.shard_index(definition.id, shard_count)
+                    ].append(definition)
+                for index, bucket in enumerate(buckets):
+                    written.append(self._shard_path(index, generation))
+                    self.backend.write(
+                        written[-1],
+                        json.dumps(
+                            {"definitions": [defn.todict() for defn in bucket]},
+                            indent="\t",
+                        ).encode("utf-8"),
+                    )
+            except BaseException:
+                logging.error(f"Resharding `{self.path}` failed, rolling back...")
+                for path in written:
+                    try:
+                        self.backend.remove(path)
+                    except FileNotFoundError:
+                        pass
+                self.resharding = False
+                self._save_manifest()
+                raise
+            self.shard_count = shard_count
+            self.generation = generation
+            self.resharding = False
+            self.shards = dict()
+            self._save_manifest()
+            for old_path in old_paths:
+                self.backend.remove(old_path)
+        logging.debug(f"Vault at `{self.path}` resharded")
+        return True
+
+    @staticmethod
+    def _check_shard_count(shard_count: int) -> None:
+        if not isinstance(shard_count, int) or shard_count < 1:
+            logging.error(f"Shard count must be at least 1, got {shard_count}")
+            raise VaultShardCountError
+
+    @staticmethod
+    def _shard_path_for(path: str, generation: int, index: int) -> str:
+        return backend_for(path).join(path, f"shard-{generation}-{index}.json")
+
+    @staticmethod
+    def shard_index(id: str, shard_count: int) -> int:
+        digest: bytes = hashlib.blake2b(id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % shard_count
+
+    @staticmethod
+    def generate(
+        path: str, shard_count: int = 16, overwrite: bool = False
+    ) -> "ShardedVault":
+        logging.debug(
+            f"Generating new sharded vault with {shard_count} shard(s) at path `{path}`..."
+        )
+        ShardedVault._check_shard_count(shard_count)
+        backend: VaultBackend = backend_for(path)
+        manifest_path: str = backend.join(path, SHARD_MANIFEST_NAME)
+        if backend.exists(manifest_path) and overwrite is False:
+            logging.error(f"Vault already exists at `{path}`")
+            raise VaultExistsError
+        backend.makedirs(path)
+        for index in range(shard_count):
+            Vault.generate(ShardedVault._shard_path_for(path, 0, index), overwrite)
+        backend.write(
+            manifest_path,
+            json.dumps({"shards": shard_count, "generation": 0}, indent="\t").encode(
+                "utf-8"
+            ),
+        )
+        logging.debug(f"New sharded vault generated at `{path}`")
+        return ShardedVault(path)
+
+
 class VaultManager:
     __slots__ = "vaults"
 
     def __init__(self, paths: Optional[str] = None) -> None:
         logging.debug("Reading vault(s)...")
+        working_paths: List[str] = VaultManager._resolve_paths(paths)
+        # fetch the plain vault files of each backend in one batch
+        grouped: Dict[VaultBackend, List[str]] = dict()
+        for path in working_paths:
+            backend: VaultBackend = backend_for(path)
+            if not backend.is_directory(path):
+                grouped.setdefault(backend, list()).append(path)
+        data: Dict[str, bytes] = dict()
+        for backend, backend_paths in grouped.items():
+            data.update(zip(backend_paths, backend.read_many(backend_paths)))
+        self.vaults: List[Union[Vault, ShardedVault]] = list()
+        for path in working_paths:
+            if path in data:
+                self.vaults.append(Vault(path, data[path]))
+            else:
+                self.vaults.append(ShardedVault(path))
+        logging.debug(f"Loaded {len(self.vaults)} vault(s)")
+
+    @staticmethod
+    def _resolve_paths(paths: Optional[str] = None) -> List[str]:
         working_paths: Optional[str] = paths
         if working_paths is None:
             logging.debug(
@@ -185,10 +491,25 @@ class VaultManager:
             )
         else:
             logging.debug(f"Reading vault(s) from provided paths: `{working_paths}`")
-        self.vaults: List[Vault] = list()
-        for path in working_paths.split(":"):
-            self.vaults.append(Vault(path))
-        logging.debug(f"Loaded {len(self.vaults)} vault(s)")
+        return VaultManager._split_paths(working_paths)
+
+    @staticmethod
+    def _split_paths(paths: str) -> List[str]:
+        # `:` separates paths, but URLs use it for their scheme and port too
+        split: List[str] = list()
+        for part in paths.split(":"):
+            if split and (
+                (split[-1] in ("http", "https") and part.startswith("//"))
+                or (
+                    "://" in split[-1]
+                    and split[-1].count(":") == 1
+                    and re.match(r"^\d+(/|$)", part) is not None
+                )
+            ):
+                split[-1] += f":{part}"
+            else:
+                split.append(part)
+        return split
 
     def get(
         self,
@@ -214,11 +535,35 @@ class VaultManager:
         )
         return synthetic_vault.definitions[0]
 
+    def get_many(
+        self,
+        ids: List[str],
+        keyname: Optional[str] = None,
+        explicit_keyname: bool = False,
+    ) -> Dict[str, VaultDefinition]:
+        logging.debug(f"Finding vault definitions for {len(ids)} id(s)...")
+        found: Dict[str, VaultDefinition] = dict()
+        for vault in self.vaults:
+            remaining: List[str] = [id for id in ids if id not in found]
+            if len(remaining) < 1:
+                break
+            for definition in vault.get_many_ids(remaining):
+                if (
+                    explicit_keyname is True or keyname is not None
+                ) and definition.keyname != keyname:
+                    continue
+                if definition.id not in found:
+                    found[definition.id] = definition
+        logging.debug(f"Found {len(found)} matching definition(s)")
+        return found
+
     def upsert_definition(
-        self, definition: VaultDefinition, vault: Optional[Vault] = None
+        self,
+        definition: VaultDefinition,
+        vault: Optional[Union[Vault, ShardedVault]] = None,
     ) -> bool:
         logging.debug(f"Adding definition with id `{definition.id}` to vault...")
-        working_vault: Optional[Vault] = definition.vault
+        working_vault: Optional[Union[Vault, ShardedVault]] = definition.vault
         if working_vault is None:
             working_vault = vault
         if working_vault is None:
@@ -229,7 +574,11 @@ class VaultManager:
         return working_vault.upsert(definition)
 
     def upsert(
-        self, id: str, ciphertext: str, keyname: Optional[str], vault: Optional[Vault]
+        self,
+        id: str,
+        ciphertext: str,
+        keyname: Optional[str],
+        vault: Optional[Union[Vault, ShardedVault]],
     ) -> bool:
         working_definition = VaultDefinition(id, keyname, ciphertext, vault)
         return self.upsert_definition(working_definition)
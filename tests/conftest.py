@@ -0,0 +1,20 @@
+import os
+import pytest
+from pudica.keychain import Keychain
+from pudica.vault import Vault
+
+
+@pytest.fixture
+def keychain_path(tmp_path, monkeypatch) -> str:
+    path: str = os.path.join(tmp_path, "keychain")
+    Keychain.generate(path)
+    monkeypatch.setenv("PUDICA_KEYCHAIN", path)
+    return path
+
+
+@pytest.fixture
+def vault_path(tmp_path, monkeypatch) -> str:
+    path: str = os.path.join(tmp_path, "vault.json")
+    Vault.generate(path)
+    monkeypatch.setenv("PUDICA_VAULTS", path)
+    return path
@@ -0,0 +1,147 @@
+import multiprocessing
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+import pytest
+from pudica.backends import HTTPBackend, register_backend
+from pudica.errors import VaultBackendError
+from pudica.vault import ShardedVault, Vault, VaultDefinition
+from writers import WRITERS, expected_ids, reshard, run, write_sharded_vault
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.objects: Dict[str, Tuple[bytes, str]] = dict()
+        self.not_modified: int = 0
+        self.version: int = 0
+        self.token: Optional[str] = None
+        self.lock: threading.Lock = threading.Lock()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    # a minimal object store: ETags, conditional GETs and conditional PUTs
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _authorized(self) -> bool:
+        if self.server.token is None:
+            return True
+        if self.headers.get("Authorization") == f"Bearer {self.server.token}":
+            return True
+        self._respond(403)
+        return False
+
+    def _respond(
+        self, status: int, body: bytes = b"", etag: Optional[str] = None
+    ) -> None:
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        with self.server.lock:
+            stored = self.server.objects.get(self.path, None)
+            if stored is not None and self.headers.get("If-None-Match") == stored[1]:
+                self.server.not_modified += 1
+        if stored is None:
+            self._respond(404)
+        elif self.headers.get("If-None-Match") == stored[1]:
+            self._respond(304, etag=stored[1])
+        else:
+            self._respond(200, stored[0], stored[1])
+
+    def do_PUT(self) -> None:
+        body: bytes = self.rfile.read(int(self.headers["Content-Length"]))
+        if not self._authorized():
+            return
+        with self.server.lock:
+            stored = self.server.objects.get(self.path, None)
+            expected = self.headers.get("If-Match", None)
+            if expected is not None and (stored is None or stored[1] != expected):
+                conflict: bool = True
+            else:
+                conflict = False
+                self.server.version += 1
+                etag: str = f'"{self.server.version}"'
+                self.server.objects[self.path] = (body, etag)
+        if conflict:
+            self._respond(412)
+        else:
+            self._respond(200, etag=etag)
+
+    def do_DELETE(self) -> None:
+        if not self._authorized():
+            return
+        with self.server.lock:
+            stored = self.server.objects.pop(self.path, None)
+        self._respond(404 if stored is None else 204)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch) -> Iterator[_StandInServer]:
+    monkeypatch.setenv("PUDICA_CACHE", str(tmp_path / "cache"))
+    stand_in: _StandInServer = _StandInServer()
+    thread: threading.Thread = threading.Thread(target=stand_in.serve_forever)
+    thread.start()
+    yield stand_in
+    stand_in.shutdown()
+    stand_in.server_close()
+    thread.join()
+
+
+def _url(server: _StandInServer, name: str) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/{name}"
+
+
+def test_unchanged_vault_is_served_from_cache(server) -> None:
+    url: str = _url(server, "vault.json")
+    Vault.generate(url)
+    Vault(url).upsert(VaultDefinition("id", "default", "ciphertext"))
+    assert Vault(url).get_ids("id")[0].ciphertext == "ciphertext"
+    assert server.not_modified >= 1
+
+
+def test_signer_authenticates_requests(server, tmp_path) -> None:
+    server.token = "secret"
+    prefix: str = _url(server, "private/")
+    signed: List[str] = list()
+
+    def signer(method: str, url: str, headers: Dict[str, str], body) -> Dict[str, str]:
+        signed.append(method)
+        return dict(headers, Authorization=f"Bearer {server.token}")
+
+    register_backend(
+        prefix, HTTPBackend(prefix, cache_dir=str(tmp_path / "signed"), signer=signer)
+    )
+    Vault.generate(f"{prefix}vault.json")
+    Vault(f"{prefix}vault.json").upsert(VaultDefinition("id", "default", "ciphertext"))
+    assert Vault(f"{prefix}vault.json").get_ids("id")[0].ciphertext == "ciphertext"
+    assert {"GET", "PUT"} <= set(signed)
+    with pytest.raises(VaultBackendError):
+        Vault(f"http://localhost:{server.server_address[1]}/private/vault.json")
+
+
+def test_sharded_upserts_during_remote_reshard_keep_every_update(server) -> None:
+    url: str = _url(server, "sharded/")
+    ShardedVault.generate(url, 4)
+    run(
+        [
+            multiprocessing.Process(target=write_sharded_vault, args=(url, writer))
+            for writer in range(WRITERS)
+        ]
+        + [multiprocessing.Process(target=reshard, args=(url,))]
+    )
+    vault: ShardedVault = ShardedVault(url)
+    assert vault.shard_count == 5
+    assert not vault.resharding
+    assert {defn.id for defn in vault.definitions} == expected_ids()
@@ -0,0 +1,32 @@
+import json
+from click.testing import CliRunner
+from pudica import Pudica
+from pudica.cli import cli
+from pudica.vault import Vault, VaultDefinition
+
+
+def test_verify_exit_status_follows_filter(keychain_path, vault_path) -> None:
+    with Pudica() as pu:
+        Vault(vault_path).upsert(pu.encrypt("secret", id="good"))
+    Vault(vault_path).upsert(VaultDefinition("bad", "other", "not-a-token"))
+    runner: CliRunner = CliRunner()
+    result = runner.invoke(cli, ["verify", "--keyname", "default"])
+    assert result.exit_code == 0
+    assert [json.loads(line)["id"] for line in result.output.splitlines()] == [
+        "good"
+    ]
+    result = runner.invoke(cli, ["verify"])
+    assert result.exit_code == 1
+    assert len(result.output.splitlines()) == 2
+
+
+def test_stream_commands_need_only_a_keychain(keychain_path, monkeypatch) -> None:
+    monkeypatch.delenv("PUDICA_VAULTS", raising=False)
+    runner: CliRunner = CliRunner()
+    encrypted = runner.invoke(cli, ["encrypt"], input=b"cleartext")
+    assert encrypted.exit_code == 0
+    decrypted = runner.invoke(cli, ["decrypt"], input=encrypted.stdout_bytes)
+    assert decrypted.exit_code == 0
+    assert decrypted.stdout_bytes == b"cleartext"
+    corrupt = runner.invoke(cli, ["decrypt"], input=encrypted.stdout_bytes[:-8])
+    assert corrupt.exit_code == 1
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+from pudica.keychain import Keychain
+from pudica.vault import ShardedVault, Vault
+from writers import (
+    WRITERS,
+    add_key,
+    expected_ids,
+    reshard,
+    run,
+    write_sharded_vault,
+    write_vault,
+)
+
+
+def test_parallel_vault_upserts_keep_every_update(tmp_path):
+    path: str = os.path.join(tmp_path, "vault.json")
+    Vault.generate(path)
+    run(
+        [
+            multiprocessing.Process(target=write_vault, args=(path, writer))
+            for writer in range(WRITERS)
+        ]
+    )
+    assert {defn.id for defn in Vault(path).definitions} == expected_ids()
+
+
+def test_parallel_key_additions_keep_every_key(keychain_path):
+    run(
+        [
+            multiprocessing.Process(target=add_key, args=(keychain_path, writer))
+            for writer in range(WRITERS)
+        ]
+    )
+    keynames = {key.keyname for key in Keychain(keychain_path).keys}
+    assert keynames == {"default"} | {f"key-{writer}" for writer in range(WRITERS)}
+
+
+def test_sharded_upserts_duringreshard_keep_every_update(tmp_path):
+    path: str = os.path.join(tmp_path, "sharded")
+    ShardedVault.generate(path, 4)
+    run(
+        [
+            multiprocessing.Process(target=write_sharded_vault, args=(path, writer))
+            for writer in range(WRITERS)
+        ]
+        + [multiprocessing.Process(target=reshard, args=(path,))]
+    )
+    vault: ShardedVault = ShardedVault(path)
+    assert vault.shard_count == 5
+    assert {defn.id for defn in vault.definitions} == expected_ids()
+
+
+def test_filtered_keychainadd_key_keeps_filter_and_disk_keys(keychain_path):
+    Keychain(keychain_path).new_key("other")
+    keychain: Keychain = Keychain.with_keyname("default", keychain_path)
+    keychain.new_key("added")
+    assert [key.keyname for key in keychain.keys] == ["default", "added"]
+    on_disk = [key.keyname for key in Keychain(keychain_path).keys]
+    assert on_disk == ["default", "other", "added"]
@@ -0,0 +1,58 @@
+import os
+import threading
+from typing import List
+from pudica.index import VaultIndex
+from pudica.vault import Vault, VaultDefinition
+
+
+THREADS: int = 32
+
+
+def test_stale_index_is_rebuilt_once(tmp_path, vault_path, monkeypatch) -> None:
+    index_path: str = os.path.join(tmp_path, "vault.index")
+    VaultIndex.build(index_path, vault_path)
+    Vault(vault_path).upsert(VaultDefinition("id", "default", "ciphertext"))
+    builds: List[str] = list()
+    build = VaultIndex.build
+
+    def counting_build(path: str, vault_paths=None) -> bool:
+        builds.append(path)
+        return build(path, vault_paths)
+
+    monkeypatch.setattr(VaultIndex, "build", staticmethod(counting_build))
+    barrier: threading.Barrier = threading.Barrier(THREADS)
+    indexes: List[VaultIndex] = list()
+
+    def open_index() -> None:
+        barrier.wait()
+        indexes.append(VaultIndex(index_path, vault_path))
+
+    threads: List[threading.Thread] = [
+        threading.Thread(target=open_index) for _ in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert len(indexes) == THREADS
+    assert all(index.get("id").ciphertext == "ciphertext" for index in indexes)
+
+
+def test_get_sees_new_definitions(tmp_path, vault_path) -> None:
+    index: VaultIndex = VaultIndex(
+        os.path.join(tmp_path, "vault.index"), vault_path, check_interval=0
+    )
+    Vault(vault_path).upsert(VaultDefinition("id", "default", "ciphertext"))
+    assert index.get("id").ciphertext == "ciphertext"
+
+
+def test_keynames_do_not_collide_with_markers(tmp_path, vault_path) -> None:
+    vault: Vault = Vault(vault_path)
+    vault.upsert(VaultDefinition("x", None, "null"))
+    vault.upsert(VaultDefinition("x", "\x00", "nul"))
+    vault.upsert(VaultDefinition("x", "\x01", "soh"))
+    index: VaultIndex = VaultIndex(os.path.join(tmp_path, "vault.index"), vault_path)
+    assert index.get("x", None, explicit_keyname=True).ciphertext == "null"
+    assert index.get("x", "\x00", explicit_keyname=True).ciphertext == "nul"
+    assert index.get("x", "\x01", explicit_keyname=True).ciphertext == "soh"
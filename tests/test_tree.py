@@ -0,0 +1,71 @@
+import os
+import pytest
+from pudica import Pudica
+from pudica.errors import TreeDestinationOverlapError
+from pudica.keychain import Keychain
+from pudica.tree import MANIFEST_NAME, TreeResult
+
+
+def _write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_unchanged_tree_is_skipped(tmp_path, keychain_path, vault_path) -> None:
+    src: str = os.path.join(tmp_path, "src")
+    dst: str = os.path.join(tmp_path, "dst")
+    _write(os.path.join(src, "a.txt"), b"a")
+    _write(os.path.join(src, "sub", "b.txt"), b"b")
+    with Pudica() as pudica:
+        assert len(pudica.encrypt_tree(src, dst).processed) == 2
+        result: TreeResult = pudica.encrypt_tree(src, dst)
+    assert result.processed == []
+    assert sorted(result.skipped) == ["a.txt", os.path.join("sub", "b.txt")]
+
+
+def test_rotated_key_reencrypts(tmp_path, keychain_path, vault_path) -> None:
+    src: str = os.path.join(tmp_path, "src")
+    dst: str = os.path.join(tmp_path, "dst")
+    out: str = os.path.join(tmp_path, "out")
+    _write(os.path.join(src, "a.txt"), b"a")
+    with Pudica() as pudica:
+        pudica.encrypt_tree(src, dst)
+    # same keyname, new key material: the old ciphertext is no longer readable
+    Keychain(keychain_path).new_key("default")
+    with Pudica() as pudica:
+        assert pudica.encrypt_tree(src, dst).processed == ["a.txt"]
+        assert pudica.decrypt_tree(dst, out).failed == []
+    with open(os.path.join(out, "a.txt"), "rb") as f:
+        assert f.read() == b"a"
+
+
+def test_corrupt_manifest_is_rebuilt(tmp_path, keychain_path, vault_path) -> None:
+    src: str = os.path.join(tmp_path, "src")
+    dst: str = os.path.join(tmp_path, "dst")
+    _write(os.path.join(src, "a.txt"), b"a")
+    with Pudica() as pudica:
+        pudica.encrypt_tree(src, dst)
+        _write(os.path.join(dst, MANIFEST_NAME), b'{"files": ')
+        assert pudica.encrypt_tree(src, dst).processed == ["a.txt"]
+        _write(os.path.join(dst, MANIFEST_NAME), b'["files"]')
+        assert pudica.encrypt_tree(src, dst).processed == ["a.txt"]
+        assert pudica.encrypt_tree(src, dst).skipped == ["a.txt"]
+
+
+def test_destination_must_not_contain_source(
+    tmp_path, keychain_path, vault_path
+) -> None:
+    src: str = os.path.join(tmp_path, "src")
+    _write(os.path.join(src, "a.txt"), b"a")
+    with Pudica() as pudica:
+        with pytest.raises(TreeDestinationOverlapError):
+            pudica.encrypt_tree(src, src)
+        with pytest.raises(TreeDestinationOverlapError):
+            pudica.encrypt_tree(src, str(tmp_path))
+        assert pudica.encrypt_tree(src, os.path.join(src, "out")).processed == [
+            "a.txt"
+        ]
+    with open(os.path.join(src, "a.txt"), "rb") as f:
+        assert f.read() == b"a"
+    assert not os.path.exists(os.path.join(src, MANIFEST_NAME))
@@ -0,0 +1,65 @@
+import os
+from typing import List
+import pytest
+from click.testing import CliRunner
+from pudica.cli import cli
+from pudica.errors import VaultShardCountError, VaultWriteFailureError
+from pudica.vault import ShardedVault, VaultDefinition
+
+
+def test_shard_count_must_be_positive(tmp_path) -> None:
+    path: str = os.path.join(tmp_path, "sharded")
+    with pytest.raises(VaultShardCountError):
+        ShardedVault.generate(path, shard_count=0)
+    vault: ShardedVault = ShardedVault.generate(path, shard_count=2)
+    vault.upsert(VaultDefinition("id", "default", "ciphertext"))
+    with pytest.raises(VaultShardCountError):
+        vault.reshard(0)
+    assert ShardedVault(path).shard_count == 2
+    assert ShardedVault(path).get_ids("id")[0].ciphertext == "ciphertext"
+
+
+def test_cli_rejects_zero_shards(tmp_path) -> None:
+    path: str = os.path.join(tmp_path, "sharded")
+    ShardedVault.generate(path, shard_count=2)
+    result = CliRunner().invoke(cli, ["reshard", "--vault-path", path, "--shards", "0"])
+    assert result.exit_code == 2
+    assert ShardedVault(path).shard_count == 2
+
+
+def test_failed_reshard_rolls_back(tmp_path, monkeypatch) -> None:
+    path: str = os.path.join(tmp_path, "sharded")
+    vault: ShardedVault = ShardedVault.generate(path, shard_count=2)
+    vault.upsert(VaultDefinition("id", "default", "ciphertext"))
+    write = vault.backend.write
+
+    def failing_write(target: str, data: bytes) -> bool:
+        if os.path.basename(target) == "shard-1-2.json":
+            raise OSError("disk full")
+        return write(target, data)
+
+    monkeypatch.setattr(vault.backend, "write", failing_write)
+    with pytest.raises(OSError):
+        vault.reshard(4)
+    monkeypatch.undo()
+    assert not [name for name in os.listdir(path) if name.startswith("shard-1-")]
+    reopened: ShardedVault = ShardedVault(path)
+    assert not reopened.resharding
+    assert reopened.shard_count == 2
+    reopened.upsert(VaultDefinition("other", "default", "ciphertext"))
+    assert {defn.id for defn in ShardedVault(path).definitions} == {"id", "other"}
+
+
+def test_shard_write_errors_are_not_retried(tmp_path, monkeypatch) -> None:
+    path: str = os.path.join(tmp_path, "sharded")
+    vault: ShardedVault = ShardedVault.generate(path, shard_count=2)
+    calls: List[str] = list()
+
+    def failing_update(target: str, mutate) -> bool:
+        calls.append(target)
+        raise PermissionError(target)
+
+    monkeypatch.setattr(vault.backend, "update", failing_update)
+    with pytest.raises(VaultWriteFailureError):
+        vault.upsert(VaultDefinition("id", "default", "ciphertext"))
+    assert len(calls) == 1
@@ -0,0 +1,41 @@
+import multiprocessing
+from typing import List
+from pudica.keychain import Keychain
+from pudica.vault import ShardedVault, Vault, VaultDefinition
+
+
+WRITERS: int = 12
+UPSERTS: int = 25
+
+
+def write_vault(path: str, writer: int) -> None:
+    vault: Vault = Vault(path)
+    for i in range(UPSERTS):
+        vault.upsert(VaultDefinition(f"{writer}-{i}", "default", f"ciphertext-{i}"))
+
+
+def write_sharded_vault(path: str, writer: int) -> None:
+    vault: ShardedVault = ShardedVault(path)
+    for i in range(UPSERTS):
+        vault.upsert(VaultDefinition(f"{writer}-{i}", "default", f"ciphertext-{i}"))
+
+
+def add_key(path: str, writer: int) -> None:
+    Keychain(path).new_key(f"key-{writer}")
+
+
+def reshard(path: str) -> None:
+    for shard_count in (3, 7, 2, 5):
+        ShardedVault(path).reshard(shard_count)
+
+
+def run(processes: List[multiprocessing.Process]) -> None:
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * len(processes)
+
+
+def expected_ids() -> set:
+    return {f"{writer}-{i}" for writer in range(WRITERS) for i in range(UPSERTS)}